@@ -0,0 +1,133 @@
+"""Memory benchmark — bytes per tracked device, before and after DeviceRecord.
+
+Runs without Home Assistant: records.py is loaded straight from its file, and
+the HA entity base class is left out on both sides since it is identical.
+
+"Before" reproduces the per-device state of the original integration: the
+instance attributes of TasmotaUpdateEntity, an entry in discovered_devices
+and a timezone-aware datetime in last_seen. "After" is a DeviceRecord in
+data["devices"] plus the thin entity (hass, record, monitor task).
+
+Usage: python benchmarks/bench_device_memory.py [device_count]
+"""
+from __future__ import annotations
+
+import gc
+import importlib.util
+import json
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+_RECORDS_PY = Path(__file__).resolve().parent.parent / "custom_components" / "tasmota_update" / "records.py"
+_spec = importlib.util.spec_from_file_location("tasmota_update_records", _RECORDS_PY)
+records = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(records)
+
+
+def _discovery_payload(index: int) -> dict:
+    """Return a freshly parsed discovery payload, as the MQTT callback sees it."""
+    mac = f"A4CF12{index:06X}"
+    return json.loads(json.dumps({
+        "ip": f"10.0.{index // 256 % 256}.{index % 256}",
+        "dn": f"Plug {index}",
+        "mac": mac,
+        "t": f"tasmota_{mac[-6:]}",
+        "ft": "%prefix%/%topic%/",
+        "sw": "14.3.0",
+        "of": "tasmota",
+    }))
+
+
+class _BeforeEntity:
+    """The instance attributes the original TasmotaUpdateEntity carried."""
+
+    def __init__(self, hass, device_id: str, payload: dict) -> None:
+        self.hass = hass
+        self.device_id = device_id
+        self.firmware_version = payload.get("sw", "unknown")
+        self._device_topic = payload.get("t", device_id)
+        self.full_topic = payload.get("ft", "%prefix%/%topic%/")
+        self._latest_version = "14.4.1"
+        self._device_ip = payload.get("ip")
+        self._github_repo = "arendst/Tasmota"
+        self._ota_firmware = payload.get("of")
+        self._in_progress = False
+        self._target_version = None
+        self._pre_update_firmware = None
+        self._grace_until = None
+        self._monitor_task = None
+        self._attr_name = "Firmware"
+        self._attr_unique_id = f"tasmota_update_{device_id}"
+        self._attr_available = True
+
+
+class _AfterEntity:
+    """The instance attributes of the thin TasmotaUpdateEntity view."""
+
+    def __init__(self, hass, record) -> None:
+        self.hass = hass
+        self.record = record
+        self._monitor_task = None
+
+
+def _build_before(count: int) -> tuple:
+    hass = object()
+    entities = []
+    discovered = set()
+    last_seen = {}
+    for index in range(count):
+        payload = _discovery_payload(index)
+        device_id = payload["mac"]
+        last_seen[device_id] = datetime.now(timezone.utc)
+        discovered.add(device_id)
+        entities.append(_BeforeEntity(hass, device_id, payload))
+        del payload
+    return entities, discovered, last_seen
+
+
+def _build_after(count: int) -> tuple:
+    hass = object()
+    devices = {}
+    entities = {}
+    for index in range(count):
+        payload = _discovery_payload(index)
+        device_id = payload["mac"]
+        record = devices[device_id] = records.DeviceRecord(device_id)
+        record.device_topic = payload.get("t", device_id)
+        record.full_topic = records.intern_str(payload.get("ft", "%prefix%/%topic%/"))
+        record.firmware_version = records.intern_str(payload.get("sw", "unknown"))
+        record.device_ip = payload.get("ip")
+        record.ota_firmware = records.intern_str(payload.get("of"))
+        record.latest_version = records.intern_str("14.4.1")
+        record.github_repo = records.intern_str("arendst/Tasmota")
+        entities[device_id] = _AfterEntity(hass, record)
+        del payload
+    return devices, entities
+
+
+def _measure(builder, count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    state = builder(count)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del state
+    return used / count
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    before = _measure(_build_before, count)
+    after = _measure(_build_after, count)
+    print(f"devices:          {count}")
+    print(f"before (bytes/dev): {before:8.0f}")
+    print(f"after  (bytes/dev): {after:8.0f}")
+    print(f"saved:            {100 * (before - after) / before:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Setup-latency benchmark — orphaned entity re-adoption on a large registry.
+
+Compares the original full-registry scan with _readopt_orphaned_entities on
+a synthetic registry holding tens of thousands of entities from other
+integrations plus a fleet of tasmota_update rows, some of them orphaned.
+Both versions must leave the registry in the same state. Rows of deleted
+devices are not generated — HA removes them together with the device.
+Needs Home Assistant installed (the integration module imports it); the
+registries themselves are lightweight fakes exposing the calls used.
+
+Usage: python benchmarks/bench_readopt.py [total_entities] [tasmota_devices]
+"""
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import custom_components.tasmota_update as integration  # noqa: E402
+
+DOMAIN = integration.DOMAIN
+ENTRY_ID = "current_entry"
+ROUNDS = 20
+
+
+class _FakeEntityRegistry:
+    """Entity registry exposing the config entry and unique_id lookups HA provides."""
+
+    def __init__(self, rows: list[SimpleNamespace]) -> None:
+        self.entities = {row.entity_id: row for row in rows}
+        self._by_unique_id = {(row.domain, row.platform, row.unique_id): row.entity_id for row in rows}
+        self._by_config_entry: dict[str | None, dict[str, SimpleNamespace]] = {}
+        for row in rows:
+            self._by_config_entry.setdefault(row.config_entry_id, {})[row.entity_id] = row
+
+    def async_get_entity_id(self, domain: str, platform: str, unique_id: str) -> str | None:
+        return self._by_unique_id.get((domain, platform, unique_id))
+
+    def async_update_entity(self, entity_id: str, **changes) -> None:
+        row = self.entities[entity_id]
+        self._by_config_entry[row.config_entry_id].pop(entity_id)
+        row.config_entry_id = changes["config_entry_id"]
+        self._by_config_entry.setdefault(row.config_entry_id, {})[entity_id] = row
+
+    def async_remove(self, entity_id: str) -> None:
+        row = self.entities.pop(entity_id)
+        del self._by_unique_id[(row.domain, row.platform, row.unique_id)]
+        self._by_config_entry[row.config_entry_id].pop(entity_id)
+
+    # Original code path
+    def async_remove_entity(self, entity_id: str) -> None:
+        self.async_remove(entity_id)
+
+
+class _FakeDeviceRegistry:
+    def __init__(self, device_ids: set[str]) -> None:
+        self.devices = {device_id: SimpleNamespace(id=device_id) for device_id in device_ids}
+
+    def async_get(self, device_id: str) -> SimpleNamespace | None:
+        return self.devices.get(device_id)
+
+
+def _build(total_entities: int, tasmota_devices: int) -> tuple:
+    rows: list[SimpleNamespace] = []
+    device_ids: set[str] = set()
+    macs: list[str] = []
+
+    for index in range(tasmota_devices):
+        mac = f"A4CF12{index:06X}"
+        device_id = f"dev_{mac}"
+        macs.append(mac)
+        device_ids.add(device_id)
+        # Every other device is orphaned
+        rows.append(SimpleNamespace(
+            entity_id=f"update.tasmota_{mac.lower()}_firmware",
+            domain="update",
+            platform=DOMAIN,
+            unique_id=f"tasmota_update_{mac}",
+            device_id=device_id,
+            config_entry_id=None if index % 2 else ENTRY_ID,
+        ))
+
+    for index in range(total_entities - tasmota_devices):
+        device_id = f"other_{index // 8}"
+        device_ids.add(device_id)
+        rows.append(SimpleNamespace(
+            entity_id=f"sensor.other_{index}",
+            domain="sensor",
+            platform="other",
+            unique_id=f"other_{index}",
+            device_id=device_id,
+            config_entry_id=f"other_entry_{index // 500}",
+        ))
+
+    entity_registry = _FakeEntityRegistry(rows)
+    device_registry = _FakeDeviceRegistry(device_ids)
+    # Seeded like _init_last_seen: one record per device in the device registry
+    hass = SimpleNamespace(data={DOMAIN: {"devices": dict.fromkeys(macs)}})
+    return hass, entity_registry, device_registry
+
+
+def _readopt_full_scan(hass, entry) -> None:
+    """The original implementation: visit every entity in the registry."""
+    entity_registry = integration.async_get_entity_registry(hass)
+    device_registry = integration.async_get_device_registry(hass)
+    for entity_id in list(entity_registry.entities):
+        reg_entry = entity_registry.entities.get(entity_id)
+        if reg_entry is None or reg_entry.platform != DOMAIN:
+            continue
+        if reg_entry.device_id is not None:
+            if device_registry.devices.get(reg_entry.device_id) is None:
+                entity_registry.async_remove_entity(reg_entry.entity_id)
+                continue
+        if reg_entry.config_entry_id != entry.entry_id:
+            entity_registry.async_update_entity(entity_id, config_entry_id=entry.entry_id)
+
+
+def _time(func, total_entities: int, tasmota_devices: int) -> tuple[float, list]:
+    entry = SimpleNamespace(entry_id=ENTRY_ID)
+    elapsed = 0.0
+    for _ in range(ROUNDS):
+        hass, entity_registry, device_registry = _build(total_entities, tasmota_devices)
+        integration.async_get_entity_registry = lambda _hass: entity_registry
+        integration.async_get_device_registry = lambda _hass: device_registry
+        integration.async_entries_for_config_entry = (
+            lambda registry, entry_id: list(registry._by_config_entry.get(entry_id, {}).values())
+        )
+        start = time.perf_counter()
+        func(hass, entry)
+        elapsed += time.perf_counter() - start
+    remaining = sorted(
+        (row.entity_id, row.config_entry_id)
+        for row in entity_registry.entities.values()
+        if row.platform == DOMAIN
+    )
+    return elapsed / ROUNDS, remaining
+
+
+def main() -> None:
+    total_entities = int(sys.argv[1]) if len(sys.argv) > 1 else 25_000
+    tasmota_devices = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    before, before_left = _time(_readopt_full_scan, total_entities, tasmota_devices)
+    after, after_left = _time(integration._readopt_orphaned_entities, total_entities, tasmota_devices)
+    assert before_left == after_left, (before_left, after_left)
+
+    print(f"entities: {total_entities}, tasmota_update rows: {tasmota_devices}")
+    print(f"full scan: {before * 1000:8.2f} ms")
+    print(f"indexed:   {after * 1000:8.2f} ms")
+    print(f"speedup:   {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
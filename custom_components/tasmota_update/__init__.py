@@ -2,21 +2,37 @@
 from __future__ import annotations
 
 import logging
-from datetime import datetime, timedelta, timezone
+import time
+from datetime import timedelta
 
 from homeassistant.components.mqtt import async_publish
+from homeassistant.components.update import DOMAIN as UPDATE_DOMAIN
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.device_registry import async_get as async_get_device_registry
+from homeassistant.helpers.entity_registry import (
+    RegistryEntry,
+    async_entries_for_config_entry,
+    async_entries_for_device,
+)
 from homeassistant.helpers.entity_registry import async_get as async_get_entity_registry
 from homeassistant.helpers.event import async_track_time_interval
 
+from .records import DeviceRecord
+from .releases import (
+    DEFAULT_CHANNEL,
+    DEFAULT_GITHUB_REPO,
+    ReleaseCache,
+    ReleaseNotesCache,
+    build_ota_url,
+    parse_source_rules,
+    resolve_source,
+)
+
 _LOGGER = logging.getLogger(__name__)
 
 DOMAIN = "tasmota_update"
 DEFAULT_CLEANUP_DAYS = 7
-DEFAULT_GITHUB_REPO = "arendst/Tasmota"
 CHECK_INTERVAL = timedelta(hours=1)
 
 
@@ -25,12 +41,35 @@ def _get_options(entry: ConfigEntry) -> dict:
     return {
         "cleanup_days": entry.options.get("cleanup_days", DEFAULT_CLEANUP_DAYS),
         "github_repo": entry.options.get("github_repo", DEFAULT_GITHUB_REPO),
+        "release_channel": entry.options.get("release_channel", DEFAULT_CHANNEL),
+        "source_rules": entry.options.get("source_rules", ""),
     }
 
 
-def _build_github_url(repo: str) -> str:
-    """Build GitHub API URL from repo string."""
-    return f"https://api.github.com/repos/{repo}/releases/latest"
+def _apply_source_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Store the fleet source and per-device source rules, and re-resolve device sources."""
+    options = _get_options(entry)
+    data = hass.data[DOMAIN]
+    try:
+        rules = parse_source_rules(options["source_rules"])
+    except ValueError:
+        _LOGGER.warning("Ignoring invalid firmware source rules", exc_info=True)
+        rules = {}
+
+    default_source = (options["github_repo"], options["release_channel"])
+    data["default_source"] = default_source
+    data["source_rules"] = rules
+
+    for record in data["devices"].values():
+        source = resolve_source(rules, default_source, record.device_id, record.ota_firmware)
+        if source == record.source:
+            continue
+        record.github_repo, record.release_channel = source
+        # Never pair the new source with the previous source's release
+        record.latest_version = data["releases"].get(source)
+        entity = data["entities"].get(record.device_id)
+        if entity is not None:
+            entity.async_write_ha_state()
 
 
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
@@ -45,50 +84,62 @@ def _readopt_orphaned_entities(hass: HomeAssistant, entry: ConfigEntry) -> None:
     entries become orphaned (config_entry_id=null). HA's async_add_entities
     may fail to re-link them automatically. This function explicitly
     re-associates them and removes stale entries.
+
+    Only this platform's rows are visited: the ones already linked come from
+    the registry's config entry index, and orphans are looked up by unique_id
+    for every device MAC we know of. Changes are applied after the lookup.
+    Orphans of deleted devices are not searched for — HA's entity registry
+    removes a device's entities together with the device.
     """
     entity_registry = async_get_entity_registry(hass)
     device_registry = async_get_device_registry(hass)
-    readopted = 0
-    removed = 0
 
-    for entity_id in list(entity_registry.entities):
-        reg_entry = entity_registry.entities.get(entity_id)
-        if reg_entry is None or reg_entry.platform != DOMAIN:
-            continue
+    candidates: dict[str, RegistryEntry] = {
+        reg_entry.entity_id: reg_entry
+        for reg_entry in async_entries_for_config_entry(entity_registry, entry.entry_id)
+    }
+    for device_mac in hass.data[DOMAIN]["devices"]:
+        entity_id = entity_registry.async_get_entity_id(
+            UPDATE_DOMAIN, DOMAIN, f"tasmota_update_{device_mac}"
+        )
+        if entity_id is not None and entity_id not in candidates:
+            candidates[entity_id] = entity_registry.entities[entity_id]
 
+    to_remove: list[str] = []
+    to_readopt: list[str] = []
+    for entity_id, reg_entry in candidates.items():
         # Remove orphaned entries for devices that no longer exist
-        if reg_entry.device_id is not None:
-            device = device_registry.devices.get(reg_entry.device_id)
-            if device is None:
-                entity_registry.async_remove_entity(reg_entry.entity_id)
-                _LOGGER.info("Removed orphaned entity %s (device no longer exists)", entity_id)
-                removed += 1
-                continue
-
+        if reg_entry.device_id is not None and device_registry.async_get(reg_entry.device_id) is None:
+            to_remove.append(entity_id)
         # Re-link orphaned entities to this config entry
-        if reg_entry.config_entry_id != entry.entry_id:
-            entity_registry.async_update_entity(
-                entity_id,
-                config_entry_id=entry.entry_id,
-            )
-            readopted += 1
+        elif reg_entry.config_entry_id != entry.entry_id:
+            to_readopt.append(entity_id)
+
+    for entity_id in to_remove:
+        entity_registry.async_remove(entity_id)
+        _LOGGER.info("Removed orphaned entity %s (device no longer exists)", entity_id)
+    for entity_id in to_readopt:
+        entity_registry.async_update_entity(entity_id, config_entry_id=entry.entry_id)
 
-    if readopted:
-        _LOGGER.info("Re-linked %d orphaned entity(ies) to config entry", readopted)
-    if removed:
-        _LOGGER.info("Removed %d orphaned entity(ies) with missing devices", removed)
+    if to_readopt:
+        _LOGGER.info("Re-linked %d orphaned entity(ies) to config entry", len(to_readopt))
+    if to_remove:
+        _LOGGER.info("Removed %d orphaned entity(ies) with missing devices", len(to_remove))
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Tasmota Update from a config entry."""
     if DOMAIN not in hass.data:
         hass.data[DOMAIN] = {
-            "entities": [],
-            "discovered_devices": set(),
-            "latest_version": None,
-            "last_seen": {},
+            "devices": {},
+            "entities": {},
+            "releases": ReleaseCache(hass),
+            "release_notes": ReleaseNotesCache(hass),
         }
 
+    # Resolve the fleet repo and per-device source rules
+    _apply_source_options(hass, entry)
+
     # Give existing devices a grace period on startup
     _init_last_seen(hass)
 
@@ -122,112 +173,103 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
+    if DOMAIN in hass.data:
+        hass.data[DOMAIN]["release_notes"].clear()
     return await hass.config_entries.async_unload_platforms(entry, ["update"])
 
 
 async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Handle options update — update OtaUrls and refresh version."""
-    new_repo = entry.options.get("github_repo", DEFAULT_GITHUB_REPO)
-
-    # Update OtaUrl on all Tasmota devices
-    await _update_ota_urls(hass, new_repo)
+    # Re-resolve the source of every device for correct release_url links
+    _apply_source_options(hass, entry)
 
-    # Refresh latest version from the (possibly new) repo
+    # Refresh latest versions from the (possibly new) sources
     await _fetch_latest_version(hass)
 
-    # Update github_repo on all live entities for correct release_url links
-    for entity in hass.data[DOMAIN]["entities"]:
-        entity._github_repo = new_repo
+    # Update OtaUrl on all Tasmota devices — pre-release URLs pin the fetched tag
+    await _update_ota_urls(hass)
 
 
-async def _update_ota_urls(hass: HomeAssistant, github_repo: str) -> None:
-    """Send OtaUrl command to all Tasmota devices when repo changes."""
+async def _update_ota_urls(hass: HomeAssistant) -> None:
+    """Send OtaUrl command to all Tasmota devices when their repo changes."""
     data = hass.data[DOMAIN]
 
-    for entity in data["entities"]:
-        ota_firmware = getattr(entity, "_ota_firmware", None)
+    for device_id in data["entities"]:
+        record = data["devices"][device_id]
+        ota_firmware = record.ota_firmware
         if not ota_firmware:
             _LOGGER.warning(
                 "Skipping OtaUrl for %s — unknown firmware type (of field missing from discovery). "
                 "Set OtaUrl manually via Tasmota web UI or MQTT.",
-                entity.device_id,
+                device_id,
             )
             continue
 
-        is_esp32 = "32" in ota_firmware
-        ext = ".bin" if is_esp32 else ".bin.gz"
-
-        if github_repo == DEFAULT_GITHUB_REPO:
-            # Official Tasmota releases — platform-specific URL path
-            platform = "tasmota32" if is_esp32 else "tasmota"
-            ota_url = f"https://ota.tasmota.com/{platform}/release/{ota_firmware}{ext}"
-        else:
-            # Custom repo — GitHub releases raw download
-            ota_url = f"https://github.com/{github_repo}/releases/latest/download/{ota_firmware}{ext}"
-
-        topic = (
-            entity.full_topic
-            .replace("%prefix%", "cmnd")
-            .replace("%topic%", entity._device_topic)
-            + "OtaUrl"
+        ota_url = build_ota_url(
+            record.github_repo, ota_firmware, record.release_channel, record.latest_version
         )
+        topic = record.command_topic("OtaUrl")
         try:
             await async_publish(hass, topic, ota_url)
-            _LOGGER.info("Set OtaUrl for %s (%s): %s", entity.device_id, ota_firmware, ota_url)
+            _LOGGER.info("Set OtaUrl for %s (%s): %s", device_id, ota_firmware, ota_url)
         except Exception:  # noqa: BLE001
-            _LOGGER.warning("Failed to set OtaUrl for %s", entity.device_id, exc_info=True)
+            _LOGGER.warning("Failed to set OtaUrl for %s", device_id, exc_info=True)
 
 
 def _init_last_seen(hass: HomeAssistant) -> None:
     """Give existing Tasmota devices a grace period on startup."""
-    data = hass.data[DOMAIN]
+    devices: dict[str, DeviceRecord] = hass.data[DOMAIN]["devices"]
     device_registry = async_get_device_registry(hass)
-    now = datetime.now(timezone.utc)
+    now = time.monotonic()
 
     for device in device_registry.devices.values():
         for identifier in device.identifiers:
             if identifier[0] == DOMAIN:
                 device_mac = identifier[1]
-                if device_mac not in data["last_seen"]:
-                    data["last_seen"][device_mac] = now
+                if device_mac not in devices:
+                    devices[device_mac] = DeviceRecord(device_mac, last_seen=now)
 
 
 def _cleanup_stale_devices(hass: HomeAssistant) -> None:
     """Remove Tasmota devices that haven't been seen for the configured period and have no entities."""
     entry = hass.config_entries.async_entries(DOMAIN)[0]
     options = _get_options(entry)
-    max_age = timedelta(days=options["cleanup_days"])
+    max_age = timedelta(days=options["cleanup_days"]).total_seconds()
 
     data = hass.data[DOMAIN]
-    last_seen = data.get("last_seen", {})
+    devices: dict[str, DeviceRecord] = data["devices"]
     device_registry = async_get_device_registry(hass)
     entity_registry = async_get_entity_registry(hass)
 
-    now = datetime.now(timezone.utc)
-    stale_devices: list[str] = []
+    now = time.monotonic()
+    stale_devices: list[tuple[str, str]] = []
 
     for device in device_registry.devices.values():
         for identifier in device.identifiers:
             if identifier[0] == DOMAIN:
                 device_mac = identifier[1]
-                seen = last_seen.get(device_mac)
-                if seen is None:
+                record = devices.get(device_mac)
+                if record is None:
                     continue
-                if now - seen > max_age:
+                age = now - record.last_seen
+                if age > max_age:
                     # Only remove if device has no entities at all
-                    has_entities = any(
-                        e.device_id == device.id
-                        for e in entity_registry.entities.values()
+                    has_entities = bool(
+                        async_entries_for_device(
+                            entity_registry, device.id, include_disabled_entities=True
+                        )
                     )
                     if not has_entities:
-                        stale_devices.append(device.id)
+                        stale_devices.append((device.id, device_mac))
                         _LOGGER.debug(
-                            "Stale device: %s (MAC: %s, last seen: %s)",
-                            device.id, device_mac, seen.isoformat(),
+                            "Stale device: %s (MAC: %s, last seen %.0f s ago)",
+                            device.id, device_mac, age,
                         )
 
-    for device_id in stale_devices:
+    for device_id, device_mac in stale_devices:
         device_registry.async_remove_device(device_id)
+        if device_mac not in data["entities"]:
+            devices.pop(device_mac, None)
         _LOGGER.info("Removed stale Tasmota device: %s", device_id)
 
     if stale_devices:
@@ -235,35 +277,22 @@ def _cleanup_stale_devices(hass: HomeAssistant) -> None:
 
 
 async def _fetch_latest_version(hass: HomeAssistant) -> None:
-    """Fetch the latest Tasmota firmware version from GitHub."""
-    entry = hass.config_entries.async_entries(DOMAIN)[0]
-    options = _get_options(entry)
-    github_url = _build_github_url(options["github_repo"])
+    """Refresh the latest firmware version of every (repo, channel) in use.
 
-    latest_version = await async_get_latest_version(hass, github_url)
-    if not latest_version:
-        return
-
-    _LOGGER.debug("Fetched latest Tasmota version: %s", latest_version)
-    hass.data[DOMAIN]["latest_version"] = latest_version
-
-    # Push the new version to all registered entities
-    for entity in hass.data[DOMAIN]["entities"]:
-        entity.set_latest_version(latest_version)
+    Each distinct source is fetched once, and distinct sources are fetched
+    concurrently.
+    """
+    data = hass.data[DOMAIN]
+    devices: dict[str, DeviceRecord] = data["devices"]
+    sources = {data["default_source"]} | {
+        record.source for record in devices.values() if record.github_repo
+    }
 
+    versions = await data["releases"].async_get_many(sources, force=True)
+    _LOGGER.debug("Fetched latest Tasmota versions: %s", versions)
 
-async def async_get_latest_version(hass: HomeAssistant, github_url: str) -> str | None:
-    """Fetch the latest firmware version tag from GitHub, stripping the leading 'v'."""
-    session = async_get_clientsession(hass)
-    try:
-        resp = await session.get(github_url, timeout=10)
-        if resp.status == 200:
-            data = await resp.json()
-            tag = data.get("tag_name", "")
-            return tag.lstrip("v") if tag else None
-        _LOGGER.warning("GitHub API returned HTTP %s", resp.status)
-    except TimeoutError:
-        _LOGGER.warning("Timeout fetching latest Tasmota version from GitHub")
-    except Exception:  # noqa: BLE001
-        _LOGGER.warning("Error fetching latest Tasmota version", exc_info=True)
-    return None
+    # Push the new versions to all registered entities
+    for device_id, entity in data["entities"].items():
+        latest_version = versions.get(devices[device_id].source)
+        if latest_version:
+            entity.set_latest_version(latest_version)
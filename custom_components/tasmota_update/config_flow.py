@@ -6,6 +6,8 @@ import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.core import callback
 
+from .releases import CHANNEL_DEVELOPMENT, CHANNELS, DEFAULT_CHANNEL, parse_source_rules
+
 DOMAIN = "tasmota_update"
 
 DEFAULT_CLEANUP_DAYS = 7
@@ -23,6 +25,14 @@ STEP_INIT_DATA_SCHEMA = vol.Schema(
             "github_repo",
             default=DEFAULT_GITHUB_REPO,
         ): str,
+        vol.Optional(
+            "release_channel",
+            default=DEFAULT_CHANNEL,
+        ): vol.In(CHANNELS),
+        vol.Optional(
+            "source_rules",
+            default="",
+        ): str,
     }
 )
 
@@ -46,6 +56,8 @@ class TasmotaUpdateConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             options={
                 "cleanup_days": DEFAULT_CLEANUP_DAYS,
                 "github_repo": DEFAULT_GITHUB_REPO,
+                "release_channel": DEFAULT_CHANNEL,
+                "source_rules": "",
             },
         )
 
@@ -63,10 +75,21 @@ class TasmotaUpdateOptionsFlow(config_entries.OptionsFlowWithConfigEntry):
 
     async def async_step_init(self, user_input=None):
         """Manage the options."""
+        errors: dict[str, str] = {}
         if user_input is not None:
-            return self.async_create_entry(title="", data=user_input)
-
-        current = self.config_entry.options
+            try:
+                parse_source_rules(user_input.get("source_rules", ""))
+            except ValueError:
+                errors["source_rules"] = "invalid_source_rules"
+            if (
+                user_input.get("release_channel") == CHANNEL_DEVELOPMENT
+                and user_input.get("github_repo", DEFAULT_GITHUB_REPO) != DEFAULT_GITHUB_REPO
+            ):
+                errors["release_channel"] = "development_needs_official_repo"
+            if not errors:
+                return self.async_create_entry(title="", data=user_input)
+
+        current = user_input or self.config_entry.options
         return self.async_show_form(
             step_id="init",
             data_schema=vol.Schema(
@@ -79,6 +102,15 @@ class TasmotaUpdateOptionsFlow(config_entries.OptionsFlowWithConfigEntry):
                         "github_repo",
                         default=current.get("github_repo", DEFAULT_GITHUB_REPO),
                     ): str,
+                    vol.Optional(
+                        "release_channel",
+                        default=current.get("release_channel", DEFAULT_CHANNEL),
+                    ): vol.In(CHANNELS),
+                    vol.Optional(
+                        "source_rules",
+                        default=current.get("source_rules", ""),
+                    ): str,
                 }
             ),
+            errors=errors,
         )
@@ -0,0 +1,110 @@
+"""Compact per-device records — the integration's bookkeeping for each Tasmota device."""
+from __future__ import annotations
+
+import sys
+import time
+
+# Upgrade stages — a two-stage upgrade goes
+# MINIMAL → MINIMAL_RESTARTING → FULL_AFTER_MINIMAL
+UPGRADE_IDLE = 0
+UPGRADE_MINIMAL = 1
+UPGRADE_MINIMAL_RESTARTING = 2
+UPGRADE_FULL = 3
+UPGRADE_FULL_AFTER_MINIMAL = 4
+
+
+def intern_str(value: str | None) -> str | None:
+    """Intern a string shared by many devices (versions, repos, topic patterns)."""
+    return sys.intern(value) if value is not None else None
+
+
+class DeviceRecord:
+    """Everything the integration tracks about one device.
+
+    Records live in hass.data[DOMAIN]["devices"] keyed by MAC, independently
+    of entities — a device known only from the registry costs one record.
+    Timestamps are time.monotonic() floats; 0.0 means unset.
+    """
+
+    __slots__ = (
+        "device_id",
+        "device_topic",
+        "full_topic",
+        "firmware_version",
+        "latest_version",
+        "github_repo",
+        "release_channel",
+        "ota_firmware",
+        "hardware",
+        "device_ip",
+        "target_version",
+        "pre_update_firmware",
+        "free_flash_kb",
+        "free_heap_kb",
+        "program_size_kb",
+        "last_seen",
+        "grace_until",
+        "probed_at",
+        "upgrade_stage",
+        "available",
+        "in_progress",
+    )
+
+    def __init__(self, device_id: str, last_seen: float | None = None) -> None:
+        self.device_id = device_id
+        self.device_topic: str = device_id
+        self.full_topic: str = "%prefix%/%topic%/"
+        self.firmware_version: str = "unknown"
+        self.latest_version: str | None = None
+        self.github_repo: str | None = None
+        self.release_channel: str | None = None
+        self.ota_firmware: str | None = None
+        self.hardware: str | None = None
+        self.device_ip: str | None = None
+        self.target_version: str | None = None
+        self.pre_update_firmware: str | None = None
+        self.free_flash_kb = 0
+        self.free_heap_kb = 0
+        self.program_size_kb = 0
+        self.last_seen = time.monotonic() if last_seen is None else last_seen
+        self.grace_until = 0.0
+        self.probed_at = 0.0
+        self.upgrade_stage = UPGRADE_IDLE
+        self.available = True
+        self.in_progress = False
+
+    def __repr__(self) -> str:
+        return f"<DeviceRecord {self.device_id} {self.firmware_version}>"
+
+    @property
+    def source(self) -> tuple[str | None, str | None]:
+        """Return the (repo, channel) this device takes firmware from."""
+        return self.github_repo, self.release_channel
+
+    def command_topic(self, command: str) -> str:
+        """Return the cmnd topic for a Tasmota command on this device."""
+        return self._topic("cmnd") + command
+
+    def stat_topic(self, suffix: str) -> str:
+        """Return a stat topic published by this device."""
+        return self._topic("stat") + suffix
+
+    def tele_topic(self, suffix: str) -> str:
+        """Return a tele topic published by this device."""
+        return self._topic("tele") + suffix
+
+    def _topic(self, prefix: str) -> str:
+        full_topic = self.full_topic
+        if not full_topic.endswith("/"):
+            full_topic += "/"
+        return full_topic.replace("%prefix%", prefix).replace("%topic%", self.device_topic)
+
+    # -- grace period --------------------------------------------------------
+
+    def is_in_grace_period(self) -> bool:
+        """Check if we're still in the availability grace period."""
+        return time.monotonic() < self.grace_until
+
+    def start_grace_period(self, seconds: float) -> None:
+        """Start the availability grace period."""
+        self.grace_until = time.monotonic() + seconds
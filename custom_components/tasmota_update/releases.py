@@ -0,0 +1,408 @@
+"""Firmware release sources — per-device repo rules, shared release and release notes caches."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from functools import lru_cache
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_GITHUB_REPO = "arendst/Tasmota"
+RELEASE_TTL = timedelta(hours=1)
+FAILURE_TTL = timedelta(minutes=5)
+RELEASE_NOTES_MAX_BYTES = 512 * 1024
+RELEASE_SUMMARY_MAX_LENGTH = 255
+
+# Release channels
+CHANNEL_STABLE = "stable"
+CHANNEL_PRERELEASE = "prerelease"
+CHANNEL_DEVELOPMENT = "development"
+CHANNELS = (CHANNEL_STABLE, CHANNEL_PRERELEASE, CHANNEL_DEVELOPMENT)
+DEFAULT_CHANNEL = CHANNEL_STABLE
+
+# Development builds on ota.tasmota.com are built from this branch
+DEVELOPMENT_BRANCH = "development"
+_DEVELOPMENT_VERSION_RE = re.compile(r"TASMOTA_VERSION\s*=\s*0x([0-9A-Fa-f]{8})")
+_VERSION_RE = re.compile(r"v?(\d+(?:\.\d+)*)(.*)")
+_SUFFIX_RE = re.compile(r"[-._\s]*([A-Za-z]*)[-._\s]*(\d*)")
+# Pre-release suffix stages, lowest first; unknown words rank with alpha
+_SUFFIX_STAGES = {"alpha": 0, "a": 0, "beta": 1, "b": 1, "pre": 2, "rc": 3}
+
+Source = tuple[str, str]
+
+
+# ---------------------------------------------------------------------------
+# Source rules
+# ---------------------------------------------------------------------------
+
+def parse_source_rules(raw: str | None) -> dict[str, tuple[str | None, str | None]]:
+    """Parse 'key=owner/repo@channel' rules into a mapping.
+
+    Rules are separated by commas or newlines. A key is either a device MAC
+    (as used in the discovery topic) or an ota_firmware name such as
+    'tasmota32c3'. Either side of the '@' may be left out ('key=owner/repo',
+    'key=@development'). Keys are matched case-insensitively. Raises
+    ValueError on a malformed rule, including a fork on the development
+    channel — only the official repository publishes development binaries.
+    """
+    rules: dict[str, tuple[str | None, str | None]] = {}
+    if not raw:
+        return rules
+
+    for chunk in raw.replace("\n", ",").split(","):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        key, sep, value = chunk.partition("=")
+        key = key.strip().lower()
+        repo, _, channel = value.strip().partition("@")
+        repo = repo.strip() or None
+        channel = channel.strip().lower() or None
+        if not sep or not key or (repo is None and channel is None):
+            raise ValueError(f"Invalid source rule: {chunk!r}")
+        if repo is not None and (
+            repo.count("/") != 1 or repo.startswith("/") or repo.endswith("/")
+        ):
+            raise ValueError(f"Invalid repository in source rule: {chunk!r}")
+        if channel is not None and channel not in CHANNELS:
+            raise ValueError(f"Invalid channel in source rule: {chunk!r}")
+        if channel == CHANNEL_DEVELOPMENT and repo not in (None, DEFAULT_GITHUB_REPO):
+            raise ValueError(
+                f"Development builds are only published by {DEFAULT_GITHUB_REPO}: {chunk!r}"
+            )
+        rules[key] = (repo, channel)
+    return rules
+
+
+def resolve_source(
+    rules: dict[str, tuple[str | None, str | None]],
+    default_source: Source,
+    device_id: str,
+    ota_firmware: str | None,
+) -> Source:
+    """Resolve the firmware repo and release channel for a device.
+
+    For each of the two, a rule for the device itself wins over a rule for
+    its firmware binary, which wins over the fleet-wide setting. A fork that
+    ends up on the development channel through mixed rules falls back to
+    stable, since forks publish no installable development binaries.
+    """
+    repo, channel = rules.get(device_id.lower(), (None, None))
+    if ota_firmware and (repo is None or channel is None):
+        firmware_repo, firmware_channel = rules.get(ota_firmware.lower(), (None, None))
+        repo = repo or firmware_repo
+        channel = channel or firmware_channel
+    repo = repo or default_source[0]
+    channel = channel or default_source[1]
+    if channel == CHANNEL_DEVELOPMENT and repo != DEFAULT_GITHUB_REPO:
+        _LOGGER.warning(
+            "No development builds for %s (%s) — using the stable channel", repo, device_id
+        )
+        channel = CHANNEL_STABLE
+    return repo, channel
+
+
+def build_github_url(repo: str, channel: str = CHANNEL_STABLE) -> str:
+    """Build the URL holding the release information for a repo and channel."""
+    if channel == CHANNEL_DEVELOPMENT:
+        return (
+            f"https://raw.githubusercontent.com/{repo}/{DEVELOPMENT_BRANCH}"
+            "/tasmota/include/tasmota_version.h"
+        )
+    if channel == CHANNEL_PRERELEASE:
+        return f"https://api.github.com/repos/{repo}/releases?per_page=10"
+    return f"https://api.github.com/repos/{repo}/releases/latest"
+
+
+def build_release_url(repo: str, channel: str, version: str) -> str:
+    """Build the web page describing a release."""
+    if channel == CHANNEL_DEVELOPMENT:
+        return f"https://github.com/{repo}/commits/{DEVELOPMENT_BRANCH}"
+    return f"https://github.com/{repo}/releases/tag/v{version}"
+
+
+def build_ota_url(
+    repo: str,
+    ota_firmware: str,
+    channel: str = CHANNEL_STABLE,
+    version: str | None = None,
+) -> str:
+    """Build the OtaUrl for a firmware binary served from the given repo and channel."""
+    is_esp32 = "32" in ota_firmware
+    ext = ".bin" if is_esp32 else ".bin.gz"
+
+    if repo == DEFAULT_GITHUB_REPO and channel != CHANNEL_PRERELEASE:
+        # Official Tasmota builds — platform-specific URL path
+        platform = "tasmota32" if is_esp32 else "tasmota"
+        if channel == CHANNEL_DEVELOPMENT:
+            return f"https://ota.tasmota.com/{platform}/{ota_firmware}{ext}"
+        return f"https://ota.tasmota.com/{platform}/release/{ota_firmware}{ext}"
+
+    if channel == CHANNEL_PRERELEASE and version:
+        # /releases/latest never points at a pre-release — pin the tag
+        return f"https://github.com/{repo}/releases/download/v{version}/{ota_firmware}{ext}"
+
+    # Custom repo — GitHub releases raw download
+    return f"https://github.com/{repo}/releases/latest/download/{ota_firmware}{ext}"
+
+
+# ---------------------------------------------------------------------------
+# Version keys
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=1024)
+def version_key(version: str | None) -> tuple[int, ...] | None:
+    """Parse a Tasmota version string once into a comparable key.
+
+    '14.3.0', 'v14.3.0' and '14.3.0.0' compare equal; development builds
+    ('14.3.0.2') sort after their base release, and a tag with a suffix
+    sorts before the same version without one, ordered by stage and then
+    number ('14.4.0-beta2' < '14.4.0-rc1' < '14.4.0-rc2' < '14.4.0'). Build
+    variants in parentheses ('14.3.0(tasmota32)') are ignored. Returns None
+    for unparseable strings.
+    """
+    if not version:
+        return None
+    match = _VERSION_RE.match(version.strip())
+    if match is None:
+        return None
+    numbers = [int(part) for part in match.group(1).split(".")][:4]
+    numbers += [0] * (4 - len(numbers))
+    suffix = match.group(2).split("(")[0].strip()
+    if not suffix:
+        return (*numbers, 1, 0, 0)
+    stage, number = _SUFFIX_RE.match(suffix).groups()
+    return (*numbers, 0, _SUFFIX_STAGES.get(stage.lower(), 0), int(number or 0))
+
+
+def _parse_development_version(header: str) -> str | None:
+    """Extract 'major.minor.patch.build' from tasmota_version.h."""
+    match = _DEVELOPMENT_VERSION_RE.search(header)
+    if match is None:
+        return None
+    value = int(match.group(1), 16)
+    return ".".join(str((value >> shift) & 0xFF) for shift in (24, 16, 8, 0))
+
+
+def _pick_prerelease(releases: list[dict]) -> str | None:
+    """Return the highest non-draft tag from a GitHub releases listing."""
+    tags = [
+        release["tag_name"].removeprefix("v")
+        for release in releases
+        if not release.get("draft") and release.get("tag_name")
+    ]
+    tags = [tag for tag in tags if version_key(tag) is not None]
+    return max(tags, key=version_key, default=None)
+
+
+# ---------------------------------------------------------------------------
+# Release cache
+# ---------------------------------------------------------------------------
+
+async def async_get_latest_version(
+    hass: HomeAssistant,
+    github_url: str,
+    channel: str = CHANNEL_STABLE,
+) -> str | None:
+    """Fetch the latest firmware version of a channel, without the leading 'v'."""
+    session = async_get_clientsession(hass)
+    try:
+        resp = await session.get(github_url, timeout=10)
+        if resp.status == 200:
+            if channel == CHANNEL_DEVELOPMENT:
+                return _parse_development_version(await resp.text())
+            data = await resp.json()
+            if channel == CHANNEL_PRERELEASE:
+                return _pick_prerelease(data)
+            tag = data.get("tag_name", "")
+            return tag.removeprefix("v") if tag else None
+        _LOGGER.warning("GitHub returned HTTP %s for %s", resp.status, github_url)
+    except TimeoutError:
+        _LOGGER.warning("Timeout fetching latest Tasmota version from %s", github_url)
+    except Exception:  # noqa: BLE001
+        _LOGGER.warning("Error fetching latest Tasmota version from %s", github_url, exc_info=True)
+    return None
+
+
+class ReleaseCache:
+    """Latest-release cache shared by every entity, keyed by (repo, channel).
+
+    Each source expires on its own schedule, and concurrent lookups for the
+    same source share a single in-flight request.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        ttl: timedelta = RELEASE_TTL,
+        failure_ttl: timedelta = FAILURE_TTL,
+    ) -> None:
+        self.hass = hass
+        self._ttl = ttl.total_seconds()
+        self._failure_ttl = failure_ttl.total_seconds()
+        self._versions: dict[Source, str | None] = {}
+        self._expires: dict[Source, float] = {}
+        self._pending: dict[Source, asyncio.Future[str | None]] = {}
+
+    def get(self, source: Source) -> str | None:
+        """Return the cached version for a source, even if it has expired."""
+        return self._versions.get(source)
+
+    def is_fresh(self, source: Source) -> bool:
+        """Return True if the source has a cached lookup that hasn't expired."""
+        return time.monotonic() < self._expires.get(source, 0.0)
+
+    def invalidate(self, source: Source | None = None) -> None:
+        """Expire one source, or every source, so the next lookup refetches."""
+        if source is None:
+            self._expires.clear()
+        else:
+            self._expires.pop(source, None)
+
+    async def async_get(self, source: Source, force: bool = False) -> str | None:
+        """Return the latest version for a source, fetching it if stale."""
+        if not force and self.is_fresh(source):
+            return self._versions.get(source)
+
+        pending = self._pending.get(source)
+        if pending is not None:
+            return await pending
+
+        repo, channel = source
+        future: asyncio.Future[str | None] = self.hass.loop.create_future()
+        self._pending[source] = future
+        try:
+            version = await async_get_latest_version(
+                self.hass, build_github_url(repo, channel), channel
+            )
+            if version:
+                self._versions[source] = version
+                self._expires[source] = time.monotonic() + self._ttl
+            else:
+                # Keep serving the last known version, but retry sooner
+                self._expires[source] = time.monotonic() + self._failure_ttl
+            future.set_result(self._versions.get(source))
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        finally:
+            del self._pending[source]
+        return future.result()
+
+    async def async_get_many(
+        self, sources: set[Source], force: bool = False
+    ) -> dict[Source, str | None]:
+        """Look up several sources concurrently — one request per distinct source."""
+        ordered = sorted(sources)
+        versions = await asyncio.gather(*(self.async_get(source, force) for source in ordered))
+        return dict(zip(ordered, versions))
+
+
+# ---------------------------------------------------------------------------
+# Release notes
+# ---------------------------------------------------------------------------
+
+async def async_get_release_notes(hass: HomeAssistant, repo: str, version: str) -> str | None:
+    """Fetch the release notes (markdown body) of a tagged GitHub release."""
+    url = f"https://api.github.com/repos/{repo}/releases/tags/v{version}"
+    session = async_get_clientsession(hass)
+    try:
+        resp = await session.get(url, timeout=10)
+        if resp.status == 200:
+            data = await resp.json()
+            return data.get("body") or None
+        _LOGGER.warning("GitHub returned HTTP %s for %s", resp.status, url)
+    except TimeoutError:
+        _LOGGER.warning("Timeout fetching release notes from %s", url)
+    except Exception:  # noqa: BLE001
+        _LOGGER.warning("Error fetching release notes from %s", url, exc_info=True)
+    return None
+
+
+def summarize_release_notes(notes: str, max_length: int = RELEASE_SUMMARY_MAX_LENGTH) -> str:
+    """Truncate release notes to fit the release_summary attribute."""
+    notes = notes.strip()
+    if len(notes) <= max_length:
+        return notes
+    return notes[: max_length - 1].rstrip() + "…"
+
+
+class ReleaseNotesCache:
+    """Release notes shared by every entity, keyed by (repo, version).
+
+    Notes are fetched once per release on first request and kept in an LRU
+    bounded by the total UTF-8 size of the cached bodies. The release_summary
+    of each release is computed once, when its notes are stored.
+    """
+
+    def __init__(self, hass: HomeAssistant, max_bytes: int = RELEASE_NOTES_MAX_BYTES) -> None:
+        self.hass = hass
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._notes: OrderedDict[Source, tuple[str, str, int]] = OrderedDict()
+        self._pending: dict[Source, asyncio.Future[str | None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._notes)
+
+    def peek(self, repo: str, version: str) -> str | None:
+        """Return cached notes without fetching or touching the LRU order."""
+        cached = self._notes.get((repo, version))
+        return cached[0] if cached else None
+
+    def summary(self, repo: str, version: str) -> str | None:
+        """Return the stored summary of cached notes, without touching the LRU order."""
+        cached = self._notes.get((repo, version))
+        return cached[1] if cached else None
+
+    async def async_get(self, repo: str, version: str) -> str | None:
+        """Return the notes for a release, fetching them on first request."""
+        key = (repo, version)
+        cached = self._notes.get(key)
+        if cached is not None:
+            self._notes.move_to_end(key)
+            return cached[0]
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await pending
+
+        future: asyncio.Future[str | None] = self.hass.loop.create_future()
+        self._pending[key] = future
+        try:
+            notes = await async_get_release_notes(self.hass, repo, version)
+            if notes:
+                self._store(key, notes)
+            future.set_result(notes)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        finally:
+            del self._pending[key]
+        return notes
+
+    def _store(self, key: Source, notes: str) -> None:
+        size = len(notes.encode())
+        if size > self.max_bytes:
+            _LOGGER.debug("Not caching %d byte release notes for %s", size, key)
+            return
+        self._notes[key] = (notes, summarize_release_notes(notes), size)
+        self.size_bytes += size
+        self.evict(self.max_bytes)
+
+    def evict(self, max_bytes: int = 0) -> None:
+        """Drop least recently used notes until at most max_bytes remain."""
+        while self.size_bytes > max_bytes and self._notes:
+            _, (_, _, size) = self._notes.popitem(last=False)
+            self.size_bytes -= size
+
+    def clear(self) -> None:
+        """Drop all cached notes."""
+        self.evict(0)
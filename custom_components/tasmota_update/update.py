@@ -4,7 +4,8 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
-from datetime import datetime, timedelta, timezone
+import time
+from datetime import timedelta
 from typing import Any
 
 from homeassistant.components.mqtt import async_publish, async_subscribe
@@ -12,14 +13,41 @@ from homeassistant.components.update import UpdateEntity, UpdateEntityFeature
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import EntityCategory
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
+from .records import (
+    UPGRADE_FULL,
+    UPGRADE_FULL_AFTER_MINIMAL,
+    UPGRADE_IDLE,
+    UPGRADE_MINIMAL,
+    UPGRADE_MINIMAL_RESTARTING,
+    DeviceRecord,
+    intern_str,
+)
+from .releases import (
+    CHANNEL_DEVELOPMENT,
+    build_ota_url,
+    build_release_url,
+    resolve_source,
+    version_key,
+)
+
 _LOGGER = logging.getLogger(__name__)
 
 DOMAIN = "tasmota_update"
 GRACE_PERIOD = timedelta(minutes=5)
 STATUS2_TIMEOUT = 5
+PREFLIGHT_TTL = timedelta(minutes=10)
+# OTA needs heap for the HTTP client and flash buffers
+MIN_FREE_HEAP_KB = 10
+# ESP8266 devices download a .bin.gz, and the download is what has to fit in
+# free flash. tasmota-minimal.bin.gz is about 270 KB; other images compress
+# to about 70 % of the running program.
+MINIMAL_FIRMWARE_KB = 280
+GZIP_RATIO = 0.72
+MINIMAL_FIRMWARE = "tasmota-minimal"
 
 # Tasmota hardware string → firmware binary name
 # Keys are stripped of trailing version info (e.g. "ESP32-C3 v0.4" → "ESP32-C3")
@@ -38,15 +66,22 @@ _HARDWARE_TO_FIRMWARE: dict[str, str] = {
 
 def _make_lwt_handler(entity: TasmotaUpdateEntity, hass: HomeAssistant):
     """Return a callback that handles LWT messages for a specific entity."""
+    record = entity.record
 
     def _handler(msg) -> None:
         payload = msg.payload
-        _LOGGER.debug("LWT for %s: %s", entity.device_id, payload)
+        _LOGGER.debug("LWT for %s: %s", record.device_id, payload)
 
         if payload == "Online":
-            entity._attr_available = True
-        elif payload == "Offline" and not entity._in_progress and not entity._is_in_grace_period():
-            entity._attr_available = False
+            record.available = True
+            # Back up on tasmota-minimal — continue with the full firmware
+            if record.upgrade_stage == UPGRADE_MINIMAL_RESTARTING:
+                hass.loop.call_soon_threadsafe(entity.start_full_stage)
+        elif payload == "Offline":
+            if record.upgrade_stage == UPGRADE_MINIMAL:
+                record.upgrade_stage = UPGRADE_MINIMAL_RESTARTING
+            if not record.in_progress and not record.is_in_grace_period():
+                record.available = False
 
         hass.loop.call_soon_threadsafe(entity.async_write_ha_state)
 
@@ -60,8 +95,8 @@ async def async_setup_entry(
 ) -> None:
     """Set up Tasmota Update entities from MQTT Discovery."""
     data = hass.data[DOMAIN]
-    discovered: set[str] = data["discovered_devices"]
-    github_repo = entry.options.get("github_repo", "arendst/Tasmota")
+    devices: dict[str, DeviceRecord] = data["devices"]
+    entities: dict[str, TasmotaUpdateEntity] = data["entities"]
 
     async def _on_discovery(msg) -> None:
         """Handle incoming Tasmota MQTT Discovery messages."""
@@ -77,31 +112,38 @@ async def async_setup_entry(
         device_id = msg.topic.split("/")[-2]
 
         # Track when this device was last seen
-        data["last_seen"][device_id] = datetime.now(timezone.utc)
+        record = devices.get(device_id)
+        if record is None:
+            record = devices[device_id] = DeviceRecord(device_id)
+        else:
+            record.last_seen = time.monotonic()
 
         # --- Existing device: update firmware version or full_topic ----------
-        for entity in data["entities"]:
-            if entity.device_id == device_id:
-                _update_existing_entity(entity, payload)
-                # Query hardware if ota_firmware is still unknown
-                if not entity._ota_firmware:
-                    hass.async_create_task(_query_device_hardware(hass, entity, payload))
-                return
+        entity = entities.get(device_id)
+        if entity is not None:
+            _update_existing_entity(entity, payload)
+            return
 
         # --- New device -----------------------------------------------------
-        if device_id in discovered:
-            return
-        discovered.add(device_id)
+        _apply_discovery(record, payload)
+        record.github_repo, record.release_channel = resolve_source(
+            data["source_rules"], data["default_source"], device_id, record.ota_firmware
+        )
+        record.latest_version = data["releases"].get(record.source)
 
-        entity = _build_entity(hass, device_id, payload, data["latest_version"], github_repo)
+        entity = TasmotaUpdateEntity(hass, record)
+        entities[device_id] = entity
         async_add_entities([entity])
-        data["entities"].append(entity)
 
-        lwt_topic = _build_lwt_topic(payload, device_id)
+        # Load the release for a repo no other device has asked for yet
+        if not data["releases"].is_fresh(record.source):
+            hass.async_create_task(_refresh_source(hass, entity))
+
+        lwt_topic = record.tele_topic("LWT")
         await async_subscribe(hass, lwt_topic, _make_lwt_handler(entity, hass))
         _LOGGER.debug(
             "Discovered %s — firmware %s, LWT on %s",
-            device_id, payload.get("sw", "?"), lwt_topic,
+            device_id, record.firmware_version, lwt_topic,
         )
 
         # Query exact hardware type via Status 2
@@ -114,11 +156,31 @@ async def async_setup_entry(
 # Helpers
 # ---------------------------------------------------------------------------
 
-def _build_lwt_topic(payload: dict, device_id: str) -> str:
-    """Construct the LWT topic from a Tasmota discovery payload."""
-    full_topic = payload.get("ft", f"%prefix%/%topic%/")
-    device_topic = payload.get("t", device_id)
-    return full_topic.replace("%prefix%", "tele").replace("%topic%", device_topic) + "LWT"
+def _apply_discovery(record: DeviceRecord, payload: dict) -> None:
+    """Copy the fields we track from a discovery payload into a device record."""
+    record.device_topic = payload.get("t", record.device_id)
+    record.full_topic = intern_str(payload.get("ft", "%prefix%/%topic%/"))
+    record.firmware_version = intern_str(payload.get("sw", "unknown"))
+    record.device_ip = payload.get("ip")
+    if payload.get("of"):
+        record.ota_firmware = intern_str(payload["of"])
+
+
+async def _refresh_source(hass: HomeAssistant, entity: TasmotaUpdateEntity) -> None:
+    """Re-resolve the entity's firmware source and load that source's latest release."""
+    data = hass.data[DOMAIN]
+    record = entity.record
+    source = resolve_source(
+        data["source_rules"], data["default_source"], record.device_id, record.ota_firmware
+    )
+    if source != record.source:
+        record.github_repo, record.release_channel = source
+        # Never pair the new source with the previous source's release
+        record.latest_version = data["releases"].get(source)
+        entity.async_write_ha_state()
+    latest_version = await data["releases"].async_get(source)
+    if latest_version and latest_version != record.latest_version:
+        entity.set_latest_version(latest_version)
 
 
 async def _query_device_hardware(
@@ -132,22 +194,55 @@ async def _query_device_hardware(
     If missing, sends Status 2 command and parses the Hardware field
     to determine the exact firmware binary name.
     """
+    record = entity.record
+
     # First: check if discovery payload already has 'of'
     of = payload.get("of")
     if of:
-        entity._ota_firmware = of
+        record.ota_firmware = intern_str(of)
         entity.async_write_ha_state()
-        _LOGGER.debug("Got ota_firmware from discovery for %s: %s", entity.device_id, of)
+        _LOGGER.debug("Got ota_firmware from discovery for %s: %s", record.device_id, of)
+        await _refresh_source(hass, entity)
         return
 
     # Fallback: query device via MQTT Status 2
-    full_topic = payload.get("ft", f"%prefix%/%topic%/")
-    if not full_topic.endswith("/"):
-        full_topic += "/"
-    device_topic = payload.get("t", entity.device_id)
+    received_data = await _query_status(hass, record, 2)
+    if received_data is None:
+        _LOGGER.warning(
+            "Timeout querying hardware from %s — set OtaUrl manually if needed",
+            record.device_id,
+        )
+        return
+
+    hardware = received_data.get("StatusFWR", {}).get("Hardware", "")
+    if not hardware:
+        _LOGGER.warning("No Hardware field in Status 2 response from %s", record.device_id)
+        return
+
+    # Strip trailing version info — e.g. "ESP32-C3 v0.4" → "ESP32-C3"
+    hw_base = hardware.split(" v")[0].strip()
+    record.hardware = intern_str(hw_base)
+
+    ota_firmware = _HARDWARE_TO_FIRMWARE.get(hw_base)
+    if ota_firmware:
+        record.ota_firmware = ota_firmware
+        entity.async_write_ha_state()
+        _LOGGER.info("Detected hardware for %s: %s → %s", record.device_id, hw_base, ota_firmware)
+        await _refresh_source(hass, entity)
+    else:
+        _LOGGER.warning(
+            "Unknown hardware '%s' (base: '%s') for %s — cannot determine firmware binary",
+            hardware, hw_base, record.device_id,
+        )
 
-    cmnd_topic = full_topic.replace("%prefix%", "cmnd").replace("%topic%", device_topic) + "Status"
-    stat_topic = full_topic.replace("%prefix%", "stat").replace("%topic%", device_topic) + "STATUS2"
+
+async def _query_status(hass: HomeAssistant, record: DeviceRecord, section: int) -> dict | None:
+    """Send 'Status <section>' to a device and return the parsed response.
+
+    Returns None if the device doesn't answer within STATUS2_TIMEOUT.
+    """
+    cmnd_topic = record.command_topic("Status")
+    stat_topic = record.stat_topic(f"STATUS{section}")
 
     result_event = asyncio.Event()
     received_data: dict = {}
@@ -162,178 +257,223 @@ async def _query_device_hardware(
     unsub = await async_subscribe(hass, stat_topic, _on_status_response)
     try:
         _LOGGER.debug(
-            "Querying hardware from %s — cmnd: %s, stat: %s",
-            entity.device_id, cmnd_topic, stat_topic,
+            "Querying Status %s from %s — cmnd: %s, stat: %s",
+            section, record.device_id, cmnd_topic, stat_topic,
         )
-        await async_publish(hass, cmnd_topic, "2")
+        await async_publish(hass, cmnd_topic, str(section))
         try:
             await asyncio.wait_for(result_event.wait(), timeout=STATUS2_TIMEOUT)
         except asyncio.TimeoutError:
-            _LOGGER.warning(
-                "Timeout querying hardware from %s — set OtaUrl manually if needed",
-                entity.device_id,
-            )
-            return
+            return None
+        return received_data
+    finally:
+        unsub()
 
-        hardware = received_data.get("StatusFWR", {}).get("Hardware", "")
-        if not hardware:
-            _LOGGER.warning("No Hardware field in Status 2 response from %s", entity.device_id)
-            return
 
-        # Strip trailing version info — e.g. "ESP32-C3 v0.4" → "ESP32-C3"
-        hw_base = hardware.split(" v")[0].strip()
+async def _probe_resources(hass: HomeAssistant, record: DeviceRecord) -> bool:
+    """Read free flash, free heap and program size via Status 4.
 
-        ota_firmware = _HARDWARE_TO_FIRMWARE.get(hw_base)
-        if ota_firmware:
-            entity._ota_firmware = ota_firmware
-            entity.async_write_ha_state()
-            _LOGGER.info("Detected hardware for %s: %s → %s", entity.device_id, hw_base, ota_firmware)
-        else:
-            _LOGGER.warning(
-                "Unknown hardware '%s' (base: '%s') for %s — cannot determine firmware binary",
-                hardware, hw_base, entity.device_id,
-            )
-    finally:
-        unsub()
+    Results are cached on the record for PREFLIGHT_TTL. Returns False if the
+    device didn't answer.
+    """
+    if record.probed_at and time.monotonic() - record.probed_at < PREFLIGHT_TTL.total_seconds():
+        return True
 
+    response = await _query_status(hass, record, 4)
+    memory = (response or {}).get("StatusMEM")
+    if not memory:
+        return False
 
-def _build_entity(
-    hass: HomeAssistant,
-    device_id: str,
-    payload: dict,
-    latest_version: str | None,
-    github_repo: str = "arendst/Tasmota",
-) -> TasmotaUpdateEntity:
-    """Create a TasmotaUpdateEntity from a discovery payload."""
-    device_name = payload.get("dn", "") or device_id
-    return TasmotaUpdateEntity(
-        hass=hass,
-        device_id=device_id,
-        device_name=device_name,
-        firmware_version=payload.get("sw", "unknown"),
-        device_topic=payload.get("t", device_id),
-        full_topic=payload.get("ft", f"%prefix%/%topic%/"),
-        latest_version=latest_version,
-        device_ip=payload.get("ip"),
-        github_repo=github_repo,
-        ota_firmware=payload.get("of"),
+    try:
+        record.free_flash_kb = int(memory.get("Free", 0))
+        record.free_heap_kb = int(memory.get("Heap", 0))
+        record.program_size_kb = int(memory.get("ProgramSize", 0))
+    except (TypeError, ValueError):
+        _LOGGER.warning("Unexpected Status 4 response from %s: %s", record.device_id, memory)
+        return False
+    record.probed_at = time.monotonic()
+    _LOGGER.debug(
+        "Resources for %s: %d KB free flash, %d KB heap, %d KB program",
+        record.device_id, record.free_flash_kb, record.free_heap_kb, record.program_size_kb,
     )
+    return True
+
+
+def _download_size_kb(record: DeviceRecord) -> int:
+    """Estimate the OTA download size of the new image from the running one.
+
+    ESP32 images are served uncompressed; ESP8266 images as .bin.gz. Devices
+    whose binary is unknown are treated as uncompressed.
+    """
+    if not record.ota_firmware or "32" in record.ota_firmware:
+        return record.program_size_kb
+    return round(record.program_size_kb * GZIP_RATIO)
+
+
+def _plan_upgrade(record: DeviceRecord) -> int:
+    """Pick the first upgrade stage from the probed resources.
+
+    Returns UPGRADE_FULL when the new image's download fits in free flash and
+    UPGRADE_MINIMAL when an ESP8266 has to go through tasmota-minimal first.
+    Raises HomeAssistantError when the device cannot upgrade at all.
+    """
+    if record.free_heap_kb < MIN_FREE_HEAP_KB:
+        raise HomeAssistantError(
+            f"{record.device_id} has only {record.free_heap_kb} KB free heap, "
+            f"at least {MIN_FREE_HEAP_KB} KB is needed for OTA"
+        )
+
+    # The new image is assumed to be about the size of the running one
+    download_kb = _download_size_kb(record)
+    if record.free_flash_kb >= download_kb:
+        return UPGRADE_FULL
+
+    if not record.ota_firmware or "32" in record.ota_firmware:
+        raise HomeAssistantError(
+            f"{record.device_id} has only {record.free_flash_kb} KB free flash for a "
+            f"{download_kb} KB firmware and cannot use a two-stage upgrade"
+        )
+    if record.free_flash_kb < MINIMAL_FIRMWARE_KB:
+        raise HomeAssistantError(
+            f"{record.device_id} has only {record.free_flash_kb} KB free flash, "
+            f"not even {MINIMAL_FIRMWARE} ({MINIMAL_FIRMWARE_KB} KB) fits"
+        )
+    return UPGRADE_MINIMAL
 
 
 def _update_existing_entity(entity: TasmotaUpdateEntity, payload: dict) -> None:
     """Push new discovery data into an already-created entity."""
-    new_full_topic = payload.get("ft", f"%prefix%/%topic%/")
-    if entity.full_topic != new_full_topic:
+    record = entity.record
+    hass = entity.hass
+
+    new_full_topic = payload.get("ft", "%prefix%/%topic%/")
+    if record.full_topic != new_full_topic:
         _LOGGER.info(
             "full_topic changed for %s: %s -> %s",
-            entity.device_id, entity.full_topic, new_full_topic,
+            record.device_id, record.full_topic, new_full_topic,
         )
-        entity.full_topic = new_full_topic
+        record.full_topic = intern_str(new_full_topic)
 
     firmware = payload.get("sw", "unknown")
-    entity.firmware_version = firmware
+    record.firmware_version = intern_str(firmware)
 
     # Update ota_firmware if discovery provides it, or re-query if still unknown
     of = payload.get("of")
     if of:
-        entity._ota_firmware = of
-    elif not entity._ota_firmware:
-        hass = entity.hass
+        if of != record.ota_firmware:
+            record.ota_firmware = intern_str(of)
+            hass.async_create_task(_refresh_source(hass, entity))
+    elif not record.ota_firmware:
         hass.async_create_task(_query_device_hardware(hass, entity, payload))
 
     # Mark update complete if firmware changed from pre-update version
-    if entity._in_progress:
-        if firmware == entity._target_version or firmware != entity._pre_update_firmware:
-            entity._in_progress = False
-            entity._cleanup_update()
-            _LOGGER.debug("Update complete for %s (now on %s)", entity.device_id, firmware)
+    if record.in_progress:
+        if record.upgrade_stage in (UPGRADE_MINIMAL, UPGRADE_MINIMAL_RESTARTING):
+            # tasmota-minimal is running — continue with the full firmware
+            if firmware != record.pre_update_firmware:
+                entity.start_full_stage()
+        elif record.upgrade_stage == UPGRADE_FULL_AFTER_MINIMAL:
+            # tasmota-minimal announces the target version too — ask which image runs
+            hass.async_create_task(_confirm_full_firmware(entity))
+        elif firmware == record.target_version or firmware != record.pre_update_firmware:
+            _complete_update(entity)
 
     entity.async_write_ha_state()
 
 
+def _complete_update(entity: TasmotaUpdateEntity) -> None:
+    """Mark the entity's update as finished."""
+    record = entity.record
+    record.in_progress = False
+    record.upgrade_stage = UPGRADE_IDLE
+    record.probed_at = 0.0
+    entity._cleanup_update()
+    _LOGGER.debug("Update complete for %s (now on %s)", record.device_id, record.firmware_version)
+
+
+async def _confirm_full_firmware(entity: TasmotaUpdateEntity) -> None:
+    """Finish a two-stage upgrade once Status 2 shows the full firmware running.
+
+    tasmota-minimal is built from the same sources as the target release, so
+    its discovery 'sw' matches the target; only the StatusFWR Version suffix
+    (e.g. "14.4.1(minimal)" vs "14.4.1(tasmota)") tells them apart.
+    """
+    record = entity.record
+    response = await _query_status(entity.hass, record, 2)
+    version = (response or {}).get("StatusFWR", {}).get("Version", "")
+    if not version:
+        _LOGGER.debug("No Status 2 version from %s — upgrade still pending", record.device_id)
+        return
+    if "(minimal)" in version:
+        _LOGGER.debug("%s still runs %s — waiting for the full firmware", record.device_id, version)
+        return
+    if record.in_progress and record.upgrade_stage == UPGRADE_FULL_AFTER_MINIMAL:
+        _complete_update(entity)
+        entity.async_write_ha_state()
+
+
 # ---------------------------------------------------------------------------
 # Entity
 # ---------------------------------------------------------------------------
 
 class TasmotaUpdateEntity(UpdateEntity):
-    """Representation of a Tasmota firmware update."""
+    """Representation of a Tasmota firmware update.
+
+    A thin view over a DeviceRecord — all per-device state lives on the record.
+    """
 
     _attr_device_class = "firmware"
-    _attr_supported_features = UpdateEntityFeature.INSTALL
+    _attr_supported_features = UpdateEntityFeature.INSTALL | UpdateEntityFeature.RELEASE_NOTES
     _attr_entity_category = EntityCategory.CONFIG
     _attr_has_entity_name = True
+    # Entity identity — with has_entity_name=True, HA prepends device name
+    _attr_name = "Firmware"
 
-    def __init__(
-        self,
-        hass: HomeAssistant,
-        device_id: str,
-        device_name: str,
-        firmware_version: str,
-        device_topic: str,
-        full_topic: str,
-        latest_version: str | None,
-        device_ip: str | None = None,
-        github_repo: str = "arendst/Tasmota",
-        ota_firmware: str | None = None,
-    ) -> None:
+    def __init__(self, hass: HomeAssistant, record: DeviceRecord) -> None:
         self.hass = hass
-        self.device_id = device_id
-        self.firmware_version = firmware_version
-        self._device_topic = device_topic
-        self.full_topic = full_topic
-        self._latest_version = latest_version
-        self._device_ip = device_ip
-        self._github_repo = github_repo
-        self._ota_firmware = ota_firmware
-        self._in_progress = False
-        self._target_version: str | None = None
-        self._pre_update_firmware: str | None = None
-        self._grace_until: datetime | None = None
+        self.record = record
         self._monitor_task: asyncio.Task | None = None
 
-        # Entity identity — with has_entity_name=True, HA prepends device name
-        self._attr_name = "Firmware"
-        self._attr_unique_id = f"tasmota_update_{device_id}"
-        self._attr_available = True
+    @property
+    def device_id(self) -> str:
+        return self.record.device_id
+
+    @property
+    def unique_id(self) -> str:
+        return f"tasmota_update_{self.record.device_id}"
+
+    @property
+    def available(self) -> bool:
+        return self.record.available
 
     @property
     def device_info(self) -> DeviceInfo:
         """Return device registry info — links to existing Tasmota device."""
         return DeviceInfo(
-            identifiers={(DOMAIN, self.device_id)},
-            connections={("mac", self.device_id)},
+            identifiers={(DOMAIN, self.record.device_id)},
+            connections={("mac", self.record.device_id)},
         )
 
-    # -- grace period --------------------------------------------------------
-
-    def _is_in_grace_period(self) -> bool:
-        """Check if we're still in the availability grace period."""
-        if self._grace_until is None:
-            return False
-        return datetime.now(timezone.utc) < self._grace_until
-
-    def _start_grace_period(self) -> None:
-        """Start the availability grace period."""
-        self._grace_until = datetime.now(timezone.utc) + GRACE_PERIOD
-
     # -- update monitor task -------------------------------------------------
 
     async def _monitor_update(self) -> None:
         """Monitor update progress and handle timeout/cleanup."""
+        record = self.record
         try:
-            while self._is_in_grace_period():
+            while record.is_in_grace_period():
                 await asyncio.sleep(10)
         except asyncio.CancelledError:
             return
 
         # Grace period expired — clean up
-        if self._in_progress:
+        if record.in_progress:
             _LOGGER.warning(
                 "Update grace period expired for %s — clearing in_progress",
-                self.device_id,
+                record.device_id,
             )
-            self._in_progress = False
-            self._target_version = None
+            record.in_progress = False
+            record.target_version = None
+            record.upgrade_stage = UPGRADE_IDLE
             self.async_write_ha_state()
 
     def _cleanup_update(self) -> None:
@@ -346,34 +486,72 @@ class TasmotaUpdateEntity(UpdateEntity):
 
     @property
     def installed_version(self) -> str | None:
-        return self.firmware_version if self.firmware_version != "unknown" else None
+        firmware_version = self.record.firmware_version
+        return firmware_version if firmware_version != "unknown" else None
 
     @property
     def latest_version(self) -> str | None:
-        return self._latest_version or self.installed_version
+        return self.record.latest_version or self.installed_version
+
+    def version_is_newer(self, latest_version: str, installed_version: str) -> bool:
+        """Compare cached version keys instead of re-parsing on every state write."""
+        latest_key = version_key(latest_version)
+        installed_key = version_key(installed_version)
+        if latest_key is None or installed_key is None:
+            return super().version_is_newer(latest_version, installed_version)
+        return latest_key > installed_key
 
     # -- update progress -----------------------------------------------------
 
     @property
     def in_progress(self) -> bool:
-        return self._in_progress
+        return self.record.in_progress
 
     # -- release metadata ----------------------------------------------------
 
     @property
     def release_url(self) -> str | None:
-        if self._latest_version:
-            return f"https://github.com/{self._github_repo}/releases/tag/v{self._latest_version}"
+        record = self.record
+        if record.latest_version:
+            return build_release_url(record.github_repo, record.release_channel, record.latest_version)
         return None
 
+    @property
+    def release_summary(self) -> str | None:
+        """Return the notes summary, once any entity has fetched them for this release."""
+        record = self.record
+        if not record.latest_version or record.release_channel == CHANNEL_DEVELOPMENT:
+            return None
+        return self.hass.data[DOMAIN]["release_notes"].summary(
+            record.github_repo, record.latest_version
+        )
+
+    async def async_release_notes(self) -> str | None:
+        """Return the notes for the latest release, fetched once per release for all entities."""
+        record = self.record
+        if not record.latest_version or record.release_channel == CHANNEL_DEVELOPMENT:
+            return None
+        had_notes = self.release_summary is not None
+        notes = await self.hass.data[DOMAIN]["release_notes"].async_get(
+            record.github_repo, record.latest_version
+        )
+        if notes and not had_notes:
+            # release_summary is now available
+            self.async_write_ha_state()
+        return notes
+
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
+        record = self.record
         attrs: dict[str, Any] = {
-            "in_progress": self._in_progress,
-            "ota_firmware": self._ota_firmware,
+            "in_progress": record.in_progress,
+            "ota_firmware": record.ota_firmware,
         }
-        if self._device_ip:
-            attrs["device_ip"] = self._device_ip
+        if record.device_ip:
+            attrs["device_ip"] = record.device_ip
+        if record.probed_at:
+            attrs["free_flash_kb"] = record.free_flash_kb
+            attrs["free_heap_kb"] = record.free_heap_kb
         return attrs
 
     @property
@@ -383,45 +561,100 @@ class TasmotaUpdateEntity(UpdateEntity):
     # -- install action ------------------------------------------------------
 
     async def async_install(self, version: str | None, backup: bool, **kwargs) -> None:
-        """Send MQTT upgrade command to the device."""
-        target = version or self._latest_version
+        """Check the device has room for the update, then start it over MQTT.
+
+        An ESP8266 without room for the new image next to the running one is
+        taken through tasmota-minimal first.
+        """
+        record = self.record
+        target = version or record.latest_version
         if not target:
-            _LOGGER.error("No target version for %s", self.device_id)
+            _LOGGER.error("No target version for %s", record.device_id)
             return
 
+        if await _probe_resources(self.hass, record):
+            try:
+                first_stage = _plan_upgrade(record)
+            except HomeAssistantError:
+                # Re-probe on the next attempt — the user may have freed resources
+                record.probed_at = 0.0
+                raise
+        else:
+            _LOGGER.warning(
+                "No Status 4 response from %s — skipping resource checks", record.device_id
+            )
+            first_stage = UPGRADE_FULL
+
         # Clean up any prior update attempt
         self._cleanup_update()
 
-        self._in_progress = True
-        self._target_version = target
-        self._pre_update_firmware = self.firmware_version
-        self._start_grace_period()
+        record.in_progress = True
+        record.target_version = target
+        record.pre_update_firmware = record.firmware_version
+        record.upgrade_stage = first_stage
+
+        if first_stage == UPGRADE_MINIMAL:
+            _LOGGER.info(
+                "%s has %d KB free flash for a %d KB download — upgrading via %s",
+                record.device_id, record.free_flash_kb, _download_size_kb(record), MINIMAL_FIRMWARE,
+            )
+            ota_url = build_ota_url(
+                record.github_repo, MINIMAL_FIRMWARE, record.release_channel, target
+            )
+        elif record.ota_firmware:
+            ota_url = build_ota_url(
+                record.github_repo, record.ota_firmware, record.release_channel, target
+            )
+        else:
+            _LOGGER.warning(
+                "Unknown firmware binary for %s — upgrading from the device's own OtaUrl",
+                record.device_id,
+            )
+            ota_url = None
+
+        if not await self._async_send_upgrade(ota_url):
+            return
+
+        # Launch monitor task to handle timeout and cleanup
+        self._monitor_task = self.hass.async_create_task(self._monitor_update())
+
+    def start_full_stage(self) -> None:
+        """Continue a two-stage upgrade once the device runs tasmota-minimal."""
+        record = self.record
+        if record.upgrade_stage not in (UPGRADE_MINIMAL, UPGRADE_MINIMAL_RESTARTING):
+            return
+        record.upgrade_stage = UPGRADE_FULL_AFTER_MINIMAL
+        record.pre_update_firmware = record.firmware_version
+        self.hass.async_create_task(self._async_send_upgrade(build_ota_url(
+            record.github_repo, record.ota_firmware, record.release_channel, record.target_version
+        )))
+
+    async def _async_send_upgrade(self, ota_url: str | None) -> bool:
+        """Point the device at ota_url (if given) and send the upgrade command."""
+        record = self.record
+        record.start_grace_period(GRACE_PERIOD.total_seconds())
         self.async_write_ha_state()
 
-        mqtt_topic = (
-            self.full_topic
-            .replace("%prefix%", "cmnd")
-            .replace("%topic%", self._device_topic)
-            + "upgrade"
-        )
-        _LOGGER.info("Sending upgrade command to %s (topic: %s)", self.device_id, mqtt_topic)
+        mqtt_topic = record.command_topic("upgrade")
+        _LOGGER.info("Sending upgrade command to %s (topic: %s)", record.device_id, mqtt_topic)
 
         try:
+            if ota_url:
+                await async_publish(self.hass, record.command_topic("OtaUrl"), ota_url)
             await async_publish(self.hass, mqtt_topic, "1")
         except Exception:  # noqa: BLE001
-            _LOGGER.error("Failed to publish upgrade command for %s", self.device_id, exc_info=True)
+            _LOGGER.error("Failed to publish upgrade command for %s", record.device_id, exc_info=True)
             self._cleanup_update()
-            self._in_progress = False
-            self._target_version = None
+            record.in_progress = False
+            record.target_version = None
+            record.upgrade_stage = UPGRADE_IDLE
             self.async_write_ha_state()
-            return
-
-        # Launch monitor task to handle timeout and cleanup
-        self._monitor_task = self.hass.async_create_task(self._monitor_update())
+            return False
+        return True
 
     # -- called from __init__.py when new version is fetched -----------------
 
     def set_latest_version(self, version: str) -> None:
         """Update the latest available version and push state."""
-        self._latest_version = version
+        self.record.latest_version = version
         self.async_write_ha_state()
@@ -0,0 +1 @@
+"""Tests for the Tasmota Update integration."""
@@ -0,0 +1,309 @@
+"""Tests for release sources, version keys and the shared release caches."""
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.tasmota_update import releases  # noqa: E402
+
+DEFAULT_SOURCE = (releases.DEFAULT_GITHUB_REPO, releases.CHANNEL_STABLE)
+
+
+# ---------------------------------------------------------------------------
+# Source rules
+# ---------------------------------------------------------------------------
+
+def test_parse_source_rules() -> None:
+    rules = releases.parse_source_rules("A4CF12345678=myfork/Tasmota,\n TASMOTA=me/fw")
+    assert rules == {
+        "a4cf12345678": ("myfork/Tasmota", None),
+        "tasmota": ("me/fw", None),
+    }
+    assert releases.parse_source_rules("") == {}
+    assert releases.parse_source_rules(None) == {}
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        "tasmota32",  # no '='
+        "=me/fw",  # empty key
+        "tasmota32=",  # no repo
+        "tasmota32=fw",  # repo without owner
+        "tasmota32=me/fw/extra",
+        "tasmota32=/fw",
+        "tasmota32=me/",
+        "tasmota32=me/fw, broken",  # one bad rule rejects the whole option
+    ],
+)
+def test_parse_source_rules_rejects(raw: str) -> None:
+    with pytest.raises(ValueError):
+        releases.parse_source_rules(raw)
+
+
+def test_resolve_source_precedence() -> None:
+    rules = releases.parse_source_rules("a4cf12345678=device/fw, tasmota32c3=firmware/fw")
+
+    # Device rule wins over the firmware rule
+    assert releases.resolve_source(rules, DEFAULT_SOURCE, "A4CF12345678", "tasmota32c3") == (
+        "device/fw", releases.CHANNEL_STABLE,
+    )
+    # Firmware rule applies to devices without their own rule
+    assert releases.resolve_source(rules, DEFAULT_SOURCE, "A4CF12000000", "TASMOTA32C3") == (
+        "firmware/fw", releases.CHANNEL_STABLE,
+    )
+    # Anything else takes the fleet-wide repo
+    assert releases.resolve_source(rules, DEFAULT_SOURCE, "A4CF12000000", "tasmota") == DEFAULT_SOURCE
+    assert releases.resolve_source(rules, DEFAULT_SOURCE, "A4CF12000000", None) == DEFAULT_SOURCE
+
+
+# ---------------------------------------------------------------------------
+# Release channels
+# ---------------------------------------------------------------------------
+
+def test_parse_source_rules_channels() -> None:
+    rules = releases.parse_source_rules(
+        "A4CF12345678=myfork/Tasmota@prerelease, tasmota32c3=@Development, "
+        "tasmota=arendst/Tasmota@development"
+    )
+    assert rules == {
+        "a4cf12345678": ("myfork/Tasmota", "prerelease"),
+        "tasmota32c3": (None, "development"),
+        "tasmota": ("arendst/Tasmota", "development"),
+    }
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        "tasmota32=@",  # neither repo nor channel
+        "tasmota32=me/fw@nightly",  # unknown channel
+        "tasmota32=me/fw@development",  # forks publish no development builds
+    ],
+)
+def test_parse_source_rules_rejects_channels(raw: str) -> None:
+    with pytest.raises(ValueError):
+        releases.parse_source_rules(raw)
+
+
+def test_resolve_source_channel_precedence() -> None:
+    rules = releases.parse_source_rules(
+        "a4cf12345678=device/fw, tasmota32c3=firmware/fw@prerelease, tasmota=firmware/fw"
+    )
+
+    # Device rule wins for the repo, the firmware rule still supplies the channel
+    assert releases.resolve_source(rules, DEFAULT_SOURCE, "A4CF12345678", "tasmota32c3") == (
+        "device/fw", "prerelease",
+    )
+    # Missing parts fall back to the fleet-wide setting
+    assert releases.resolve_source(rules, DEFAULT_SOURCE, "A4CF12000000", "tasmota") == (
+        "firmware/fw", releases.CHANNEL_STABLE,
+    )
+
+
+def test_resolve_source_fork_never_on_development() -> None:
+    rules = releases.parse_source_rules("tasmota=me/fw")
+    default = (releases.DEFAULT_GITHUB_REPO, releases.CHANNEL_DEVELOPMENT)
+
+    assert releases.resolve_source(rules, default, "A4CF12000000", "tasmota") == (
+        "me/fw", releases.CHANNEL_STABLE,
+    )
+    assert releases.resolve_source(rules, default, "A4CF12000000", "tasmota32") == default
+
+
+# ---------------------------------------------------------------------------
+# Version keys
+# ---------------------------------------------------------------------------
+
+def test_version_key_ordering() -> None:
+    ordered = [
+        "14.3.0",
+        "14.3.0.2",
+        "14.4.0-beta",
+        "14.4.0-beta2",
+        "14.4.0-rc1",
+        "14.4.0-rc2",
+        "14.4.0-rc10",
+        "14.4.0",
+        "14.4.0.1",
+        "15.0.0",
+    ]
+    assert sorted(reversed(ordered), key=releases.version_key) == ordered
+
+
+def test_prerelease_picks_latest_candidate() -> None:
+    listing = [
+        {"tag_name": "v14.4.0-rc1"},
+        {"tag_name": "v14.4.0-rc3", "draft": True},
+        {"tag_name": "v14.4.0-rc2"},
+        {"tag_name": "v14.3.0"},
+    ]
+    assert releases._pick_prerelease(listing) == "14.4.0-rc2"
+
+
+def test_version_key_equivalent_forms() -> None:
+    key = releases.version_key("14.3.0")
+    assert releases.version_key("v14.3.0") == key
+    assert releases.version_key("14.3.0.0") == key
+    assert releases.version_key("14.3") == key
+    # Build variants in parentheses are ignored
+    assert releases.version_key("14.3.0(tasmota32)") == key
+    assert releases.version_key("14.3.0(minimal)") == key
+    assert releases.version_key("14.4.0-rc1(tasmota)") == releases.version_key("14.4.0-rc1")
+
+
+@pytest.mark.parametrize("version", [None, "", "unknown", "dev"])
+def test_version_key_unparseable(version: str | None) -> None:
+    assert releases.version_key(version) is None
+
+
+# ---------------------------------------------------------------------------
+# Release cache
+# ---------------------------------------------------------------------------
+
+def test_release_cache_shares_in_flight_fetch(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[tuple[str, str]] = []
+
+    async def _fake_get_latest_version(hass, github_url: str, channel: str) -> str:
+        calls.append((github_url, channel))
+        await asyncio.sleep(0)
+        return "14.4.1"
+
+    monkeypatch.setattr(releases, "async_get_latest_version", _fake_get_latest_version)
+
+    async def _run() -> None:
+        cache = releases.ReleaseCache(SimpleNamespace(loop=asyncio.get_running_loop()))
+        results = await asyncio.gather(*(cache.async_get(DEFAULT_SOURCE) for _ in range(5)))
+        assert results == ["14.4.1"] * 5
+        assert len(calls) == 1
+        assert cache.is_fresh(DEFAULT_SOURCE)
+
+        # Fresh entries are served without another request
+        assert await cache.async_get(DEFAULT_SOURCE) == "14.4.1"
+        assert len(calls) == 1
+
+        # One request per distinct source, even when forced
+        prerelease = (releases.DEFAULT_GITHUB_REPO, releases.CHANNEL_PRERELEASE)
+        versions = await cache.async_get_many({DEFAULT_SOURCE, prerelease}, force=True)
+        assert versions == {DEFAULT_SOURCE: "14.4.1", prerelease: "14.4.1"}
+        assert len(calls) == 3
+
+    asyncio.run(_run())
+
+
+# ---------------------------------------------------------------------------
+# Release notes cache
+# ---------------------------------------------------------------------------
+
+def _patch_release_notes(monkeypatch: pytest.MonkeyPatch, bodies: dict[str, str]) -> list[str]:
+    """Serve release notes from bodies (keyed by version) and record each fetch."""
+    calls: list[str] = []
+
+    async def _fake_get_release_notes(hass, repo: str, version: str) -> str | None:
+        calls.append(version)
+        await asyncio.sleep(0)
+        return bodies.get(version)
+
+    monkeypatch.setattr(releases, "async_get_release_notes", _fake_get_release_notes)
+    return calls
+
+
+def test_release_notes_cache_evicts_least_recently_used(monkeypatch: pytest.MonkeyPatch) -> None:
+    repo = releases.DEFAULT_GITHUB_REPO
+    bodies = {"14.1.0": "a" * 40, "14.2.0": "b" * 40, "14.3.0": "c" * 40, "14.4.0": "é" * 20}
+    calls = _patch_release_notes(monkeypatch, bodies)
+
+    async def _run() -> None:
+        cache = releases.ReleaseNotesCache(
+            SimpleNamespace(loop=asyncio.get_running_loop()), max_bytes=100
+        )
+        await cache.async_get(repo, "14.1.0")
+        await cache.async_get(repo, "14.2.0")
+        assert cache.size_bytes == 80
+
+        # A hit moves 14.1.0 to the back, so 14.2.0 is evicted first
+        await cache.async_get(repo, "14.1.0")
+        await cache.async_get(repo, "14.3.0")
+        assert cache.peek(repo, "14.2.0") is None
+        assert cache.peek(repo, "14.1.0") == bodies["14.1.0"]
+        assert (len(cache), cache.size_bytes) == (2, 80)
+
+        # Size is counted in UTF-8 bytes: 20 × "é" is 40 bytes
+        await cache.async_get(repo, "14.4.0")
+        assert cache.peek(repo, "14.1.0") is None
+        assert cache.peek(repo, "14.3.0") is not None
+        assert (len(cache), cache.size_bytes) == (2, 80)
+        assert calls == ["14.1.0", "14.2.0", "14.3.0", "14.4.0"]
+
+        cache.clear()
+        assert (len(cache), cache.size_bytes) == (0, 0)
+
+    asyncio.run(_run())
+
+
+def test_release_notes_cache_skips_oversized_notes(monkeypatch: pytest.MonkeyPatch) -> None:
+    repo = releases.DEFAULT_GITHUB_REPO
+    calls = _patch_release_notes(monkeypatch, {"14.1.0": "a" * 40, "14.2.0": "b" * 101})
+
+    async def _run() -> None:
+        cache = releases.ReleaseNotesCache(
+            SimpleNamespace(loop=asyncio.get_running_loop()), max_bytes=100
+        )
+        await cache.async_get(repo, "14.1.0")
+        assert await cache.async_get(repo, "14.2.0") == "b" * 101
+        # Too large to cache, and it doesn't push out what fits
+        assert cache.peek(repo, "14.2.0") is None
+        assert cache.peek(repo, "14.1.0") is not None
+        assert cache.size_bytes == 40
+        await cache.async_get(repo, "14.2.0")
+        assert calls == ["14.1.0", "14.2.0", "14.2.0"]
+
+    asyncio.run(_run())
+
+
+def test_release_notes_cache_shares_in_flight_fetch(monkeypatch: pytest.MonkeyPatch) -> None:
+    repo = releases.DEFAULT_GITHUB_REPO
+    calls = _patch_release_notes(monkeypatch, {"14.4.0": "notes"})
+
+    async def _run() -> None:
+        cache = releases.ReleaseNotesCache(SimpleNamespace(loop=asyncio.get_running_loop()))
+        results = await asyncio.gather(*(cache.async_get(repo, "14.4.0") for _ in range(5)))
+        assert results == ["notes"] * 5
+        assert calls == ["14.4.0"]
+
+        # Missing notes aren't cached, but concurrent callers still share the request
+        results = await asyncio.gather(*(cache.async_get(repo, "14.5.0") for _ in range(3)))
+        assert results == [None] * 3
+        assert calls == ["14.4.0", "14.5.0"]
+
+    asyncio.run(_run())
+
+
+def test_release_notes_cache_stores_summary_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    repo = releases.DEFAULT_GITHUB_REPO
+    body = "\n" + "x" * 1000
+    _patch_release_notes(monkeypatch, {"14.4.0": body})
+    summaries: list[str] = []
+    summarize = releases.summarize_release_notes
+
+    def _counting_summarize(notes: str, *args) -> str:
+        summaries.append(notes)
+        return summarize(notes, *args)
+
+    monkeypatch.setattr(releases, "summarize_release_notes", _counting_summarize)
+
+    async def _run() -> None:
+        cache = releases.ReleaseNotesCache(SimpleNamespace(loop=asyncio.get_running_loop()))
+        assert cache.summary(repo, "14.4.0") is None
+        await cache.async_get(repo, "14.4.0")
+        for _ in range(3):
+            summary = cache.summary(repo, "14.4.0")
+        assert len(summary) == releases.RELEASE_SUMMARY_MAX_LENGTH
+        assert summary.startswith("x") and summary.endswith("…")
+        assert len(summaries) == 1
+
+    asyncio.run(_run())
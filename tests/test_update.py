@@ -0,0 +1,264 @@
+"""Tests for pre-flight planning and the two-stage upgrade state machine."""
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from homeassistant.exceptions import HomeAssistantError  # noqa: E402
+
+from custom_components.tasmota_update import update  # noqa: E402
+from custom_components.tasmota_update.records import (  # noqa: E402
+    UPGRADE_FULL,
+    UPGRADE_FULL_AFTER_MINIMAL,
+    UPGRADE_IDLE,
+    UPGRADE_MINIMAL,
+    UPGRADE_MINIMAL_RESTARTING,
+    DeviceRecord,
+)
+
+
+def _record(
+    ota_firmware: str | None = "tasmota",
+    free_flash_kb: int = 2000,
+    free_heap_kb: int = 25,
+    program_size_kb: int = 620,
+) -> DeviceRecord:
+    record = DeviceRecord("A4CF12345678")
+    record.ota_firmware = ota_firmware
+    record.github_repo = "arendst/Tasmota"
+    record.release_channel = "stable"
+    record.free_flash_kb = free_flash_kb
+    record.free_heap_kb = free_heap_kb
+    record.program_size_kb = program_size_kb
+    return record
+
+
+class _FakeHass:
+    """Just enough of hass for the handlers under test."""
+
+    def __init__(self) -> None:
+        self.loop = SimpleNamespace(call_soon_threadsafe=lambda func, *args: func(*args))
+        self.created: list = []
+
+    def async_create_task(self, coro):
+        self.created.append(coro)
+        coro.close()
+
+
+class _FakeEntity:
+    def __init__(self, record: DeviceRecord) -> None:
+        self.record = record
+        self.hass = _FakeHass()
+        self.full_stage_started = 0
+        self.writes = 0
+
+    def start_full_stage(self) -> None:
+        self.full_stage_started += 1
+
+    def async_write_ha_state(self) -> None:
+        self.writes += 1
+
+    def _cleanup_update(self) -> None:
+        pass
+
+
+def _upgrading(stage: int) -> DeviceRecord:
+    record = _record()
+    record.in_progress = True
+    record.upgrade_stage = stage
+    record.target_version = "14.4.1"
+    record.pre_update_firmware = "14.3.0"
+    record.firmware_version = "14.3.0"
+    return record
+
+
+# ---------------------------------------------------------------------------
+# Pre-flight planning
+# ---------------------------------------------------------------------------
+
+def test_plan_full_when_download_fits() -> None:
+    assert update._plan_upgrade(_record(free_flash_kb=2000)) == UPGRADE_FULL
+    # The .bin.gz download fits even though the running image doesn't
+    assert update._plan_upgrade(_record(free_flash_kb=500)) == UPGRADE_FULL
+    assert update._plan_upgrade(_record("tasmota32", free_flash_kb=1500, program_size_kb=1400)) == (
+        UPGRADE_FULL
+    )
+
+
+@pytest.mark.parametrize("free_flash_kb", [350, 380])
+def test_plan_minimal_for_1mb_esp8266(free_flash_kb: int) -> None:
+    assert update._plan_upgrade(_record(free_flash_kb=free_flash_kb)) == UPGRADE_MINIMAL
+
+
+@pytest.mark.parametrize(
+    "record",
+    [
+        _record(free_heap_kb=5),  # not enough heap for OTA
+        _record(free_flash_kb=250),  # not even tasmota-minimal.bin.gz fits
+        _record("tasmota32", free_flash_kb=1000, program_size_kb=1400),  # no minimal for ESP32
+        _record(None, free_flash_kb=400),  # unknown binary — can't pick a minimal image
+    ],
+)
+def test_plan_rejects(record: DeviceRecord) -> None:
+    with pytest.raises(HomeAssistantError):
+        update._plan_upgrade(record)
+
+
+# ---------------------------------------------------------------------------
+# Two-stage upgrade
+# ---------------------------------------------------------------------------
+
+def test_lwt_moves_minimal_stage_along() -> None:
+    record = _upgrading(UPGRADE_MINIMAL)
+    entity = _FakeEntity(record)
+    handler = update._make_lwt_handler(entity, entity.hass)
+
+    handler(SimpleNamespace(payload="Offline"))
+    assert record.upgrade_stage == UPGRADE_MINIMAL_RESTARTING
+    assert entity.full_stage_started == 0
+
+    handler(SimpleNamespace(payload="Online"))
+    assert entity.full_stage_started == 1
+
+
+def test_lwt_online_ignored_outside_minimal_restart() -> None:
+    record = _upgrading(UPGRADE_FULL)
+    entity = _FakeEntity(record)
+    handler = update._make_lwt_handler(entity, entity.hass)
+
+    handler(SimpleNamespace(payload="Offline"))
+    handler(SimpleNamespace(payload="Online"))
+    assert record.upgrade_stage == UPGRADE_FULL
+    assert entity.full_stage_started == 0
+
+
+@pytest.mark.parametrize("stage", [UPGRADE_MINIMAL, UPGRADE_MINIMAL_RESTARTING])
+def test_discovery_firmware_change_starts_full_stage(stage: int) -> None:
+    entity = _FakeEntity(_upgrading(stage))
+
+    # Same firmware — still flashing tasmota-minimal
+    update._update_existing_entity(entity, {"sw": "14.3.0", "of": "tasmota"})
+    assert entity.full_stage_started == 0
+
+    # tasmota-minimal announces the target version
+    update._update_existing_entity(entity, {"sw": "14.4.1", "of": "tasmota"})
+    assert entity.full_stage_started == 1
+    assert entity.record.in_progress
+
+
+def test_start_full_stage_sends_full_image() -> None:
+    record = _upgrading(UPGRADE_MINIMAL_RESTARTING)
+    record.firmware_version = "14.4.1"
+    entity = update.TasmotaUpdateEntity(_FakeHass(), record)
+    sent: list[str | None] = []
+
+    async def _send(ota_url: str | None) -> bool:
+        sent.append(ota_url)
+        return True
+
+    entity._async_send_upgrade = _send
+    entity.start_full_stage()
+    assert record.upgrade_stage == UPGRADE_FULL_AFTER_MINIMAL
+    assert record.pre_update_firmware == "14.4.1"
+    assert len(entity.hass.created) == 1
+
+    # A second Online or discovery message doesn't start it again
+    entity.start_full_stage()
+    assert len(entity.hass.created) == 1
+
+
+def test_full_stage_discovery_does_not_complete_on_version() -> None:
+    record = _upgrading(UPGRADE_FULL_AFTER_MINIMAL)
+    record.pre_update_firmware = "14.4.1"
+    entity = _FakeEntity(record)
+
+    # tasmota-minimal reports the target version — only Status 2 can confirm
+    update._update_existing_entity(entity, {"sw": "14.4.1", "of": "tasmota"})
+    assert record.in_progress
+    assert [coro.__name__ for coro in entity.hass.created] == ["_confirm_full_firmware"]
+
+
+@pytest.mark.parametrize(
+    ("version", "completed"),
+    [
+        ("14.4.1(minimal)", False),
+        ("", False),
+        ("14.4.1(tasmota)", True),
+    ],
+)
+def test_confirm_full_firmware(
+    monkeypatch: pytest.MonkeyPatch, version: str, completed: bool
+) -> None:
+    record = _upgrading(UPGRADE_FULL_AFTER_MINIMAL)
+    record.probed_at = 1.0
+    entity = _FakeEntity(record)
+
+    async def _fake_query_status(hass, record, section: int) -> dict:
+        assert section == 2
+        return {"StatusFWR": {"Version": version}}
+
+    monkeypatch.setattr(update, "_query_status", _fake_query_status)
+    asyncio.run(update._confirm_full_firmware(entity))
+
+    assert record.in_progress is not completed
+    if completed:
+        assert record.upgrade_stage == UPGRADE_IDLE
+        assert record.probed_at == 0.0
+    else:
+        assert record.upgrade_stage == UPGRADE_FULL_AFTER_MINIMAL
+
+
+# ---------------------------------------------------------------------------
+# Install
+# ---------------------------------------------------------------------------
+
+def _install(monkeypatch: pytest.MonkeyPatch, record: DeviceRecord) -> list[tuple[str, str]]:
+    """Run async_install against a fake Status 4 reply; return what was published."""
+    published: list[tuple[str, str]] = []
+
+    async def _fake_query_status(hass, record, section: int) -> dict:
+        return {"StatusMEM": {
+            "Free": record.free_flash_kb,
+            "Heap": record.free_heap_kb,
+            "ProgramSize": record.program_size_kb,
+        }}
+
+    async def _fake_publish(hass, topic: str, payload: str) -> None:
+        published.append((topic, payload))
+
+    monkeypatch.setattr(update, "_query_status", _fake_query_status)
+    monkeypatch.setattr(update, "async_publish", _fake_publish)
+
+    async def _run() -> None:
+        entity = update.TasmotaUpdateEntity(_FakeHass(), record)
+        entity.async_write_ha_state = lambda: None
+        await entity.async_install("14.4.1", backup=False)
+
+    asyncio.run(_run())
+    return published
+
+
+def test_install_publishes_ota_url_for_each_first_stage(monkeypatch: pytest.MonkeyPatch) -> None:
+    published = _install(monkeypatch, _record(free_flash_kb=2000))
+    assert published == [
+        ("cmnd/A4CF12345678/OtaUrl", "https://ota.tasmota.com/tasmota/release/tasmota.bin.gz"),
+        ("cmnd/A4CF12345678/upgrade", "1"),
+    ]
+
+    published = _install(monkeypatch, _record(free_flash_kb=360))
+    assert published[0] == (
+        "cmnd/A4CF12345678/OtaUrl",
+        "https://ota.tasmota.com/tasmota/release/tasmota-minimal.bin.gz",
+    )
+
+
+def test_install_rejection_clears_probe(monkeypatch: pytest.MonkeyPatch) -> None:
+    record = _record(free_flash_kb=250)
+    with pytest.raises(HomeAssistantError):
+        _install(monkeypatch, record)
+    assert record.probed_at == 0.0
+    assert not record.in_progress